@@ -2,15 +2,53 @@
 # @author: zisull@qq.com
 # @date: 2024年11月19日
 
-import configparser
+import atexit
+import hashlib
+import importlib
+import io
 import os
-import xml.etree.ElementTree as ElementTree
+import shutil
+import stat
+import weakref
 from collections.abc import MutableMapping
-from threading import Lock
+from contextlib import contextmanager
+from functools import lru_cache
+from threading import Condition, Lock, Timer, get_ident
 
 import orjson
-import toml
-import yaml
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+_MISSING = object()
+_pending_configs = weakref.WeakSet()  # 还有改动未写盘的配置,解释器退出时统一保存
+
+
+def _content_hash(buf: bytes):
+    """文件内容的摘要,用于判断保存内容是否变化;装了 xxhash 时用它,否则用 blake2b"""
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(buf)
+    return hashlib.blake2b(buf, digest_size=16).digest()
+
+
+@lru_cache(maxsize=1024)
+def _split_key(key: str) -> tuple:
+    """拆分 'a.b.c' 形式的键,同一个键反复读写时直接用缓存"""
+    return tuple(key.split('.'))
+
+
+def _unwrap(value):
+    """存入数据前把 ConfigNode 换成它包装的字典,保证数据里只有普通的 dict,可以直接序列化"""
+    return value.data if isinstance(value, ConfigNode) else value
+
+
+@atexit.register
+def _flush_pending():
+    """退出前保存 batch_threshold / flush_interval 攒下的改动,延迟计时器是守护线程,不会等到触发"""
+    for config in list(_pending_configs):
+        config.flush()
 
 
 class Config:
@@ -21,6 +59,9 @@ class Config:
         replace: 是否覆盖已有配置文件,默认False
         auto_save: 是否自动保存,默认True
         backup: 是否备份原配置文件,默认False
+        batch_threshold: 自动保存时累计多少次改动才真正写盘,默认1(每次改动都写盘)
+        flush_interval: 自动保存的延迟秒数,未达到阈值的改动会在该时间后统一写盘,默认None(不延迟)
+        durable: 写盘后是否 fsync,保证断电也不丢失,默认False
 
 配置管理器，支持多种格式的配置文件，并提供读写操作。dict <=> [ini, xml, json, toml, yaml]\n
 注意 __setattr__ ：\n
@@ -31,17 +72,27 @@ cc = Diconfig(way="toml")\n
 cc.a = 100 # 不会保存到data和配置文件，也不会触发自动保存\n
 cc.a.b = 200 # 会保存到data和配置文件，也会触发自动保存\n
 你可以选择 cc.write("a", 100) 赋值单.状态，也可以用 cc.update({"a": 100}) 批量赋值,也可以用 cc.set_data({"a": 100}) 完全赋值。
+大量修改时可以用 with cc.batch(): ... ，期间不写盘，退出时统一保存一次。
 """
 
     def __init__(self, data: dict = None, file: str = "config", way: str = "toml", replace: bool = False,
-                 auto_save: bool = True, backup: bool = False):
+                 auto_save: bool = True, backup: bool = False, batch_threshold: int = 1,
+                 flush_interval: float = None, durable: bool = False):
         self.way = self.validate_format(way)
         self.file = self.ensure_extension(file)
         self.auto_save = auto_save
+        self._pending_writes = 0
+        self._batch_threshold = max(1, batch_threshold)
+        self._flush_interval = flush_interval
+        self._flush_timer = None
+        self._batch_depth = 0
+        self._durable = durable
+        self._last_hash = None  # 上次写入文件内容的摘要,内容不变时跳过写盘
+        self._section_cache = {}  # ini/xml 各顶层节上次序列化的内容快照和结果
         self.data = ConfigNode(data if data is not None else {}, manager=self)
         self._dirty = False if data is not None else True
         self.backup = backup
-        self._lock = Lock()
+        self._lock = _RWLock()
         self.handler = ConfigHandlerFactory.get_handler(self.way)
 
         if os.path.exists(self.file) and not replace:
@@ -52,12 +103,13 @@ cc.a.b = 200 # 会保存到data和配置文件，也会触发自动保存\n
     @property
     def json(self) -> str:
         """返回配置数据，json格式"""
-        return orjson.dumps(self.dict, option=orjson.OPT_INDENT_2).decode('utf-8')
+        with self._lock.read_lock():
+            return orjson.dumps(self.data.data, option=orjson.OPT_INDENT_2).decode('utf-8')
 
     @property
     def dict(self) -> dict:
-        """返回配置数据，字典格式"""
-        return self.data.to_dict()
+        """返回配置数据，字典格式(即内部数据本身,不是副本)"""
+        return self.data.data
 
     @dict.setter
     def dict(self, value: dict):
@@ -101,46 +153,37 @@ cc.a.b = 200 # 会保存到data和配置文件，也会触发自动保存\n
 
     def read(self, key: str, default=None):
         """返回 配置值 or 默认值 """
-        keys = key.split('.')
-        node = self.data
-        for k in keys:
-            if isinstance(node, ConfigNode):
-                node = node.data.get(k, None)
-                if isinstance(node, dict):
-                    node = ConfigNode(node, manager=self)
-                elif node is None:
+        with self._lock.read_lock():
+            node = self.data.data
+            for k in _split_key(key):
+                if not isinstance(node, dict):
                     return default
-            else:
-                return default
+                node = node.get(k)
+                if node is None:
+                    return default
+        if isinstance(node, dict):
+            return ConfigNode(node, manager=self)
         return node
 
     def write(self, key: str, value, overwrite_mode: bool = False):
         """写 配置项,配置值,覆写模式 (用于字典路径冲突时候,是否覆写已有路径,默认不覆盖
         例如 write a.b.c = 1, a.b = 2, 将会丢失a.b.c的值,反之则会丢失a.b的值"""
-        self.mark_dirty()
-        keys = key.split('.')
-        node = self.data
-
-        for k in keys[:-1]:
-            if overwrite_mode:
-                if isinstance(node, ConfigNode):
-                    if k not in node.data or not isinstance(node.data[k], dict):
-                        node.data[k] = {}
-                else:
-                    node.data = {k: {}}
-                node = node[k]
-            else:
-                node = getattr(node, k)
-
-        setattr(node, keys[-1], value)
-
-        if self.auto_save:
-            self.save()
+        with self._lock.write_lock():
+            keys = _split_key(key)
+            parent = self.data._ensure_path(keys[:-1], overwrite_mode)
+            if parent is None:
+                print(f"写入 {key} 失败：路径上已有非字典的配置值,可以使用 overwrite_mode=True 覆写")
+                return
+            parent[keys[-1]] = _unwrap(value)
+            self.mark_dirty()
+            self._schedule_save()
 
     def del_clean(self):
         """清空配置项,删除配置文件"""
-        self.mark_dirty()
-        with self._lock:
+        with self._lock.write_lock():
+            self.mark_dirty()
+            self._cancel_flush()
+            self._last_hash = None
             if os.path.exists(self.file):
                 try:
                     os.remove(self.file)
@@ -154,50 +197,57 @@ cc.a.b = 200 # 会保存到data和配置文件，也会触发自动保存\n
 
     def update(self, data: dict):
         """更新添加配置项"""
-        self.mark_dirty()
-        self._recursive_update(self.data.data, data)
-        if self.auto_save:
-            self.save()
+        with self._lock.write_lock():
+            if self._recursive_update(self.data.data, data):
+                self.mark_dirty()
+                self._schedule_save()
 
     def set_data(self, data: dict):
         """设置完整配置数据,也可以用 dict 属性来设置"""
-        self.mark_dirty()
-        self.data = ConfigNode(data, manager=self)
-        if self.auto_save:
-            self.save()
+        with self._lock.write_lock():
+            self.mark_dirty()
+            self.data = ConfigNode(data, manager=self)
+            self._schedule_save()
 
     def del_key(self, key: str):
-        """删除配置项"""
-        self.mark_dirty()
-        keys = key.split('.')
-        if not keys:
-            return
-        node = self.data
-        parent_nodes = []
-        for k in keys[:-1]:
-            parent_nodes.append((node, k))
-            node = getattr(node, k, None)
-            if node is None:
+        """删除配置项,删除后为空的父级也一并删除"""
+        with self._lock.write_lock():
+            keys = _split_key(key)
+            node = self.data.data
+            parents = []
+            for k in keys[:-1]:
+                child = node.get(k)
+                if not isinstance(child, dict):
+                    return
+                parents.append((node, k))
+                node = child
+            if keys[-1] not in node:
                 return
-        final_key = keys[-1]
-        if final_key in node.data:
-            del node.data[final_key]
-            while parent_nodes:
-                parent, key_in_parent = parent_nodes.pop()
-                if not parent[key_in_parent].data:
-                    del parent[key_in_parent]
-                else:
+            del node[keys[-1]]
+            for parent, k in reversed(parents):
+                if parent[k]:
                     break
-            if self.auto_save:
-                self.save()
+                del parent[k]
+            self.mark_dirty()
+            self._schedule_save()
 
     def _load(self):
-        with self._lock:
+        with self._lock.write_lock():
+            self._last_hash = None
+            self._section_cache.clear()  # 格式可能已经改变
             try:
-                with open(self.file, 'rb' if self.way == "json" else 'r',
-                          encoding=None if self.way == "json" else 'utf-8') as f:
-                    raw_data = self.handler.load(f)
-                    self.data = ConfigNode(raw_data, manager=self)
+                # 读到的原始内容同时作为 save 时的比较基准,加载后未改动就不会写回
+                with open(self.file, 'rb') as f:
+                    buf = f.read()
+                if self.way == "json":
+                    # json 直接把字节交给 orjson
+                    raw_data = orjson.loads(buf)
+                else:
+                    raw_data = self.handler.load(io.StringIO(buf.decode('utf-8'), newline=None))
+                self.data = ConfigNode(raw_data, manager=self)
+                self._last_hash = _content_hash(buf)
+                self._dirty = False
+                self._cancel_flush()  # 加载前尚未保存的改动已被文件内容取代
             except Exception as e:
                 print(f"加载配置文件 {self.file} 失败：{e}")
 
@@ -213,64 +263,191 @@ cc.a.b = 200 # 会保存到data和配置文件，也会触发自动保存\n
         """改动标记,用于判断是否需要保存,一般不用自己调用"""
         self._dirty = True
 
+    def _schedule_save(self):
+        """自动保存入口:累计改动次数,达到阈值立即写盘,否则交给延迟计时器"""
+        if not self.auto_save:
+            return
+        self._pending_writes += 1
+        if self._pending_writes >= self._batch_threshold:
+            self.flush()
+            return
+        _pending_configs.add(self)
+        if self._flush_interval and self._flush_timer is None:
+            self._flush_timer = Timer(self._flush_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _cancel_flush(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        self._pending_writes = 0
+        _pending_configs.discard(self)
+
+    def flush(self):
+        """立即保存所有尚未写盘的改动"""
+        self._cancel_flush()
+        self.save()
+
+    @contextmanager
+    def batch(self):
+        """批量修改,期间暂停自动保存,退出时统一保存一次;嵌套使用时只在最外层退出时保存"""
+        auto_save = self.auto_save
+        self.auto_save = False
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            self.auto_save = auto_save
+            if not self._batch_depth:
+                self.flush()
+
     def save(self):
         """保存配置文件"""
-        with self._lock:
+        with self._lock.write_lock():
             if not self._dirty:
                 return
             try:
-                self._backup_file()
-                self._ensure_file_exists()
-                with open(self.file, 'wb' if self.way == "json" else 'w',
-                          encoding=None if self.way == "json" else 'utf-8') as f:
-                    self.handler.save(self.data.to_dict(), f)
+                data = self.data.data
+                assert not any(isinstance(v, ConfigNode) for v in data.values()), "配置数据中不应包含 ConfigNode"
+                buf = self._serialize(self.handler, self.way, data, self._section_cache)
+                buf_hash = _content_hash(buf)
+                if buf_hash != self._last_hash:
+                    self._backup_file()
+                    self._write_file(self.file, buf)
+                    self._last_hash = buf_hash
                 self._dirty = False
             except Exception as e:
                 print(f"保存配置文件失败 {self.file}: {e}")
 
     def save_to_file(self, file: str = None, way: str = None):
         """不会改变原有方式,另存到指定文件"""
-        with self._lock:
+        try:
+            # 使用局部变量来存储文件路径和格式
+            target_file = self.ensure_extension(file) if file else self.file
+            target_way = self.validate_format(way) if way else self.way
+            target_handler = ConfigHandlerFactory.get_handler(target_way)
+            # 只在序列化时持有读锁,写盘时不阻塞其他读写
+            with self._lock.read_lock():
+                buf = self._serialize(target_handler, target_way, self.data.data)
+            self._write_file(target_file, buf)
+
+            print(f"配置已成功另存到 {target_file}")
+        except Exception as e:
+            print(f"另存配置文件失败 {target_file}: {e}")
+
+    def save_many(self, targets):
+        """一次另存到多个文件, targets: [(文件, 格式), ...];同一格式只序列化一次,各文件并行写盘"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        jobs = []
+        for file, way in targets:
             try:
-                # 使用局部变量来存储文件路径和格式
-                target_file = self.ensure_extension(file) if file else self.file
-                target_way = self.validate_format(way) if way else self.way
-                target_handler = ConfigHandlerFactory.get_handler(target_way)
-
-                # 确保文件存在
-                self._ensure_file_exists()
-
-                # 打开文件并保存数据
-                with open(target_file, 'wb' if target_way == "json" else 'w',
-                          encoding=None if target_way == "json" else 'utf-8') as f:
-                    target_handler.save(self.data.to_dict(), f)
+                way = self.validate_format(way) if way else self.way
+            except ValueError as e:
+                print(f"另存配置文件失败 {file}: {e}")
+                continue
+            jobs.append((file if os.path.splitext(file)[1] else f"{file}.{way}", way))
+        if not jobs:
+            return
 
-                print(f"配置已成功另存到 {target_file}")
+        def serialize(_way):
+            try:
+                return self._serialize(ConfigHandlerFactory.get_handler(_way), _way, self.data.data)
+            except Exception as _e:
+                return _e
+
+        def write(job):
+            buf = bufs[job[1]]
+            if isinstance(buf, Exception):
+                raise buf
+            self._write_file(job[0], buf)
+
+        with ThreadPoolExecutor(max_workers=min(len(jobs), 4)) as pool:
+            # 序列化期间持有读锁,写盘时已释放
+            with self._lock.read_lock():
+                ways = list(dict.fromkeys(way for _, way in jobs))
+                bufs = dict(zip(ways, pool.map(serialize, ways)))
+            futures = [(job[0], pool.submit(write, job)) for job in jobs]
+        for file, future in futures:
+            try:
+                future.result()
+                print(f"配置已成功另存到 {file}")
             except Exception as e:
-                print(f"另存配置文件失败 {target_file}: {e}")
+                print(f"另存配置文件失败 {file}: {e}")
 
-    def _ensure_file_exists(self):
-        if not os.path.exists(self.file):
-            with open(self.file, 'w'):
-                pass  # 创建一个空文件
+    @staticmethod
+    def _serialize(handler, way, data, section_cache=None) -> bytes:
+        """先序列化到内存,便于比较内容和一次性写盘"""
+        if way == "json":
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE)
+        buf = io.StringIO()
+        if section_cache is not None and handler.incremental:
+            handler.save(data, buf, section_cache)
+        else:
+            handler.save(data, buf)
+        return buf.getvalue().encode('utf-8')
+
+    def _write_file(self, file, buf: bytes):
+        """先写临时文件再替换,避免写到一半时留下残缺的配置文件"""
+        file = os.path.realpath(file)  # 符号链接写到它指向的文件,链接本身保留
+        tmp_file = f"{file}.{get_ident()}.tmp"  # 按线程区分,允许并发另存同一文件
+        # 直接 os.write 整块数据,不经过 Python 文件对象的缓冲
+        fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+        try:
+            try:
+                try:
+                    mode = stat.S_IMODE(os.stat(file).st_mode)
+                except FileNotFoundError:
+                    pass
+                else:  # 沿用原文件的权限,例如保存密钥的 0600 配置
+                    if hasattr(os, 'fchmod'):
+                        os.fchmod(fd, mode)
+                    else:
+                        os.chmod(tmp_file, mode)
+                view = memoryview(buf)
+                while view:
+                    view = view[os.write(fd, view):]
+                if self._durable:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+            os.replace(tmp_file, file)
+        except BaseException:
+            try:
+                os.unlink(tmp_file)
+            except OSError:
+                pass
+            raise
+        if self._durable and os.name == 'posix':
+            # 替换文件是对目录的修改,目录也要 fsync 才能保证断电后看到的是新文件
+            dir_fd = os.open(os.path.dirname(file), os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
 
     def _backup_file(self):
         if os.path.exists(self.file) and self.backup:
             backup_file = self.file + '.bak'
             try:
-                os.replace(self.file, backup_file)
+                # 复制而不是移走,原文件的权限和符号链接都不受影响
+                shutil.copy2(self.file, backup_file)
             except Exception as e:
                 print(f"备份文件失败: {e}")
 
-    def _recursive_update(self, original, new_data):
-        """递归更新配置项"""
+    def _recursive_update(self, original, new_data) -> bool:
+        """递归更新配置项,返回是否真的发生了变化"""
+        changed = False
         for key, value in new_data.items():
-            if isinstance(value, dict) and isinstance(original.get(key, None), dict):
-                self._recursive_update(original[key], value)
-            else:
-                if original.get(key) != value:  # 检查是否真的发生了变化
-                    original[key] = value
-                    self.mark_dirty()  # 标记数据已更改
+            current = original.get(key, _MISSING)
+            if isinstance(value, dict) and isinstance(current, dict):
+                changed = self._recursive_update(current, value) or changed
+            elif current is _MISSING or current != value:
+                original[key] = _unwrap(value)
+                changed = True
+        return changed
 
     @staticmethod
     def validate_format(_way):
@@ -306,10 +483,12 @@ cc.a.b = 200 # 会保存到data和配置文件，也会触发自动保存\n
         return len(self.data)
 
     def __iter__(self):
-        return iter(self.data)
+        with self._lock.read_lock():
+            return iter(list(self.data))
 
     def __contains__(self, item):
-        return item in self.data
+        with self._lock.read_lock():
+            return item in self.data
 
     def __bool__(self):
         return bool(self.data)
@@ -318,16 +497,37 @@ cc.a.b = 200 # 会保存到data和配置文件，也会触发自动保存\n
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.save()
+        self.flush()
 
 
 class ConfigHandler:
+    incremental = False  # 为 True 时 save 额外接受 cache 参数,内容没变的顶层节复用上次的序列化结果
+
     def load(self, file):
         raise NotImplementedError
 
     def save(self, data, file):
         raise NotImplementedError
 
+    @staticmethod
+    def _render_sections(data, cache, render):
+        """逐个顶层节序列化,节的内容与上次序列化时相同就直接复用上次的结果"""
+        parts = []
+        for key, value in data.items():
+            # 按内容而不是改动记录判断:多个节可能共用同一个字典对象.
+            # 用 repr 做快照,1、1.0、True 这类相等但序列化结果不同的值也能区分
+            snapshot = repr(value)
+            cached = cache.get(key)
+            if cached is not None and cached[0] == snapshot:
+                part = cached[1]
+            else:
+                part = render(key, value)
+                cache[key] = (snapshot, part)
+            parts.append(part)
+        for key in cache.keys() - data.keys():
+            del cache[key]
+        return parts
+
 
 class JSONConfigHandler(ConfigHandler):
     def load(self, file):
@@ -337,93 +537,242 @@ class JSONConfigHandler(ConfigHandler):
         file.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
 
 
+@lru_cache(maxsize=None)
+def _import_first(*names):
+    """按顺序导入第一个可用的模块,结果缓存,避免每次都重新查找装不上的库"""
+    for name in names[:-1]:
+        try:
+            return importlib.import_module(name)
+        except ImportError:
+            pass
+    return importlib.import_module(names[-1])
+
+
+# 以下格式的解析库只在首次使用时导入,避免 import diconfig 时加载用不到的库
 class TOMLConfigHandler(ConfigHandler):
     def load(self, file):
-        return toml.load(file)
+        # tomllib(3.11+ 标准库) / tomli 比 toml 快得多,都没有时才用 toml
+        return _import_first('tomllib', 'tomli', 'toml').loads(file.read())
 
     def save(self, data, file):
-        file.write(toml.dumps(data))
+        module = _import_first('tomli_w', 'toml')
+        if module.__name__ == 'tomli_w':
+            # toml 写出时跳过值为 None 的键, tomli_w 遇到 None 直接报错,这里先去掉,两者结果一致
+            data = self._drop_none(data)
+        file.write(module.dumps(data))
+
+    @staticmethod
+    def _drop_none(value):
+        if isinstance(value, dict):
+            return {k: TOMLConfigHandler._drop_none(v) for k, v in value.items() if v is not None}
+        if isinstance(value, list):
+            return [TOMLConfigHandler._drop_none(v) for v in value]
+        return value
 
 
 class YAMLConfigHandler(ConfigHandler):
     def load(self, file):
-        return yaml.safe_load(file)
+        import yaml
+        # PyYAML 带 libyaml 时使用 C 实现的加载器
+        return yaml.load(file, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
 
     def save(self, data, file):
-        yaml.dump(data, file, allow_unicode=True)
+        import yaml
+        yaml.dump(data, file, Dumper=getattr(yaml, 'CDumper', yaml.Dumper), allow_unicode=True)
 
 
 class INIConfigHandler(ConfigHandler):
+    incremental = True
+    strict = False  # 为 True 时始终用 configparser 读写;默认只有遇到插值、DEFAULT 节等写法时才交给 configparser
+
     def load(self, file):
+        if self.strict:
+            return self._load_configparser(file)
+        text = file.read()
+        data = self._parse(text)
+        if data is None:
+            return self._load_configparser(io.StringIO(text))
+        return data
+
+    def save(self, data, file, cache=None):
+        # 如果 data 不是嵌套字典，包装在一个默认的 section 中
+        if not all(isinstance(v, dict) for v in data.values()):
+            data = {'默认': data}
+        if self.strict or 'DEFAULT' in data:
+            self._save_configparser(data, file)
+            if cache is not None:
+                cache.clear()
+        elif cache is None:
+            file.write(''.join([self._dump_section(name, values) for name, values in data.items()]))
+        else:
+            file.write(''.join(self._render_sections(data, cache, self._dump_section)))
+
+    @staticmethod
+    def _parse(text):
+        """解析只有 [节] 和 key = value 的 ini,结果与 configparser 一致;遇到其他写法返回 None"""
+        data = {}
+        section = None
+        key = None  # 可以接续下一行的键
+        for line in text.split('\n'):
+            stripped = line.strip()
+            if not stripped or stripped[0] in '#;':
+                key = None
+                continue
+            if line[0].isspace():  # 缩进行是上一个值的续行
+                if key is None or '%' in stripped:
+                    return None
+                section[key] += '\n' + stripped
+                continue
+            if stripped[0] == '[':
+                end = stripped.rfind(']')
+                name = stripped[1:end]
+                if end < 2 or name == 'DEFAULT' or name in data:
+                    return None
+                data[name] = section = {}
+                key = None
+                continue
+            eq, colon = stripped.find('='), stripped.find(':')
+            pos = min(eq, colon) if eq >= 0 and colon >= 0 else max(eq, colon)
+            if section is None or pos <= 0:
+                return None
+            key = stripped[:pos].rstrip().lower()
+            value = stripped[pos + 1:].lstrip()
+            if '%' in value or key in section:
+                return None
+            section[key] = value
+        return data
+
+    @staticmethod
+    def _dump_section(name, values):
+        parts = [f"[{name}]\n"]
+        seen = set()
+        for key, value in values.items():
+            key = str(key).lower()
+            if value is None or key in seen or '%' in str(value):
+                # 交给 configparser 按原有规则处理(或报错)
+                return INIConfigHandler._dump_section_configparser(name, values)
+            seen.add(key)
+            value = str(value).replace('\n', '\n\t')
+            parts.append(f"{key} = {value}\n")
+        parts.append("\n")
+        return ''.join(parts)
+
+    @staticmethod
+    def _load_configparser(file):
+        import configparser
         config = configparser.ConfigParser()
         config.read_file(file)
         return {s: dict(config.items(s)) for s in config.sections()}
 
-    def save(self, data, file):
+    @staticmethod
+    def _save_configparser(data, file):
+        import configparser
         config = configparser.ConfigParser()
-        # 如果 data 不是嵌套字典，包装在一个默认的 section 中
-        if not all(isinstance(v, dict) for v in data.values()):
-            data = {'默认': data}
         config.read_dict(data)
         config.write(file)
 
+    @staticmethod
+    def _dump_section_configparser(name, values):
+        buf = io.StringIO()
+        INIConfigHandler._save_configparser({name: values}, buf)
+        return buf.getvalue()
+
 
 class XMLConfigHandler(ConfigHandler):
+    incremental = True
+
     def load(self, file):
+        from xml.etree import ElementTree
         tree = ElementTree.parse(file)
         root = tree.getroot()
         return self._element_to_dict(root)
 
-    def save(self, data, file):
-        root = self._dict_to_element('config', data)
-        tree = ElementTree.ElementTree(root)
-        # 使用 'utf-8' 编码保存文件，并确保 write() 方法接收的是字符串流
-        tree.write(file, encoding='unicode', xml_declaration=True)
+    def save(self, data, file, cache=None):
+        from xml.etree import ElementTree
+        if cache is None:
+            root = self._dict_to_element('config', data)
+            tree = ElementTree.ElementTree(root)
+            # 使用 'utf-8' 编码保存文件，并确保 write() 方法接收的是字符串流
+            tree.write(file, encoding='unicode', xml_declaration=True)
+            return
+        parts = self._render_sections(data, cache, self._dump_section)
+        # 与 ElementTree.write 输出的声明和根节点保持一致
+        encoding = getattr(file, 'encoding', None) or 'utf-8'
+        file.write(f"<?xml version='1.0' encoding='{encoding}'?>\n")
+        file.write(f"<config>{''.join(parts)}</config>" if parts else "<config />")
+
+    def _dump_section(self, key, value):
+        from xml.etree import ElementTree
+        if isinstance(value, dict):
+            element = self._dict_to_element(key, value)
+        else:
+            element = ElementTree.Element(key)
+            element.text = str(value)
+        return ElementTree.tostring(element, encoding='unicode')
 
-    def _element_to_dict(self, element):
+    @staticmethod
+    def _element_to_dict(element):
+        # 用显式栈代替递归,层级再深也不会超过递归上限
         data = {}
-        for child in element:
-            if len(child):  # If the child has children, it's a nested structure
-                data[child.tag] = self._element_to_dict(child)
-            else:
-                data[child.tag] = child.text
+        stack = [(element, data)]
+        while stack:
+            parent, out = stack.pop()
+            for child in parent:
+                if len(child):  # If the child has children, it's a nested structure
+                    out[child.tag] = sub = {}
+                    stack.append((child, sub))
+                else:
+                    out[child.tag] = child.text
         return data
 
-    def _dict_to_element(self, tag, data):
-        element = ElementTree.Element(tag)
-        for key, value in data.items():
-            if isinstance(value, dict):
-                child = self._dict_to_element(key, value)
-            else:
-                child = ElementTree.Element(key)
-                child.text = str(value)
-            element.append(child)
-        return element
+    @staticmethod
+    def _dict_to_element(tag, data):
+        from xml.etree import ElementTree
+        root = ElementTree.Element(tag)
+        stack = [(root, data)]
+        while stack:
+            element, items = stack.pop()
+            for key, value in items.items():
+                child = ElementTree.SubElement(element, key)
+                if isinstance(value, dict):
+                    stack.append((child, value))
+                else:
+                    child.text = str(value)
+        return root
 
 
 class ConfigHandlerFactory:
-    handlers = {
-        'json': JSONConfigHandler(),
-        'toml': TOMLConfigHandler(),
-        'yaml': YAMLConfigHandler(),
-        'ini': INIConfigHandler(),
-        'xml': XMLConfigHandler(),  # Added XML handler
+    handler_classes = {
+        'json': JSONConfigHandler,
+        'toml': TOMLConfigHandler,
+        'yaml': YAMLConfigHandler,
+        'ini': INIConfigHandler,
+        'xml': XMLConfigHandler,  # Added XML handler
     }
+    handlers = {}  # 已创建的处理器实例,首次 get_handler 时才创建
 
     @staticmethod
     def get_handler(_format):
         handler = ConfigHandlerFactory.handlers.get(_format)
         if not handler:
-            raise ValueError(f"Unsupported format: {_format}")
+            handler_class = ConfigHandlerFactory.handler_classes.get(_format)
+            if not handler_class:
+                raise ValueError(f"Unsupported format: {_format}")
+            handler = ConfigHandlerFactory.handlers[_format] = handler_class()
         return handler
 
 
 class ConfigNode(MutableMapping):
+    # 内部属性都在 __slots__ 里,只能通过 object.__setattr__ 赋值;普通的属性赋值一律写入配置数据
+    __slots__ = ('_data', '_manager', '_parent', '_key_in_parent', '_child_cache')
+
     def __init__(self, data=None, manager=None, parent=None, key_in_parent=None):
-        self._data = data if data is not None else {}
-        self._manager = manager
-        self._parent = parent
-        self._key_in_parent = key_in_parent
+        set_attr = object.__setattr__
+        set_attr(self, '_data', _unwrap(data) if data is not None else {})
+        set_attr(self, '_manager', manager)
+        set_attr(self, '_parent', parent)
+        set_attr(self, '_key_in_parent', key_in_parent)
+        set_attr(self, '_child_cache', {})  # 子节点包装对象,重复访问时复用
 
     @property
     def data(self):
@@ -431,31 +780,51 @@ class ConfigNode(MutableMapping):
 
     @data.setter
     def data(self, value):
-        self._data = value
+        object.__setattr__(self, '_data', _unwrap(value))
         self._trigger_save()
 
+    def _child(self, key, value):
+        node = self._child_cache.get(key)
+        if node is None or node._data is not value:
+            node = ConfigNode(value, manager=self._manager, parent=self, key_in_parent=key)
+            self._child_cache[key] = node
+        return node
+
+    def _ensure_path(self, keys, overwrite: bool = True):
+        """按 keys 逐级取子字典,缺少的自动创建;遇到非字典值时 overwrite 为 True 则覆盖,否则返回 None"""
+        node = self._data
+        for k in keys:
+            child = node.get(k)
+            if not isinstance(child, dict):
+                if child is not None and not overwrite:
+                    return None
+                node[k] = child = {}
+            node = child
+        return node
+
     def _trigger_save(self):
-        if self._manager:
+        if self._manager is not None:
             self._manager.mark_dirty()
-            if self._manager.auto_save:
-                self._manager.save()
+            self._manager._schedule_save()
 
     def __getitem__(self, key):
         value = self._data.get(key)
         if isinstance(value, dict):
-            return ConfigNode(value, manager=self._manager, parent=self, key_in_parent=key)
+            return self._child(key, value)
         elif value is not None:
             return value
         else:
             raise KeyError(f"Key '{key}' not found.")
 
     def __setitem__(self, key, value):
-        self._data[key] = value
+        self._data[key] = _unwrap(value)
+        self._child_cache.pop(key, None)
         self._trigger_save()
 
     def __delitem__(self, key):
         if key in self._data:
             del self._data[key]
+            self._child_cache.pop(key, None)
             self._trigger_save()
         else:
             raise KeyError(f"Key '{key}' not found.")
@@ -467,22 +836,22 @@ class ConfigNode(MutableMapping):
         return len(self._data)
 
     def __getattr__(self, key):
+        if key in ConfigNode.__slots__ or key.startswith('__'):
+            raise AttributeError(key)
         if key in self._data:
             value = self._data[key]
             if isinstance(value, dict):
-                return ConfigNode(value, manager=self._manager, parent=self, key_in_parent=key)
+                return self._child(key, value)
             else:
                 return value
         else:
-            self._data[key] = {}
-            return ConfigNode(self._data[key], manager=self._manager, key_in_parent=key)
+            # 读取不存在的键不改动数据,返回的节点在首次写入时才挂到父节点上,保证 cc.a.b = 1 可用
+            return _LazyNode({}, manager=self._manager, parent=self, key_in_parent=key)
 
     def __setattr__(self, key, value):
-        if key.startswith('_'):
-            super().__setattr__(key, value)
-        else:
-            self._data[key] = value
-            self._trigger_save()
+        self._data[key] = _unwrap(value)
+        self._child_cache.pop(key, None)
+        self._trigger_save()
 
     def to_dict(self):
         return {key: (value.to_dict() if isinstance(value, ConfigNode) else value)
@@ -492,5 +861,81 @@ class ConfigNode(MutableMapping):
         return repr(self.to_dict())
 
 
+class _LazyNode(ConfigNode):
+    """尚不存在的路径节点,写入时才把自身数据挂到父节点"""
+    __slots__ = ()
+
+    def _trigger_save(self):
+        self._attach()
+        super()._trigger_save()
+
+    def _attach(self):
+        parent = self._parent
+        if isinstance(parent, _LazyNode):
+            parent._attach()
+        current = parent.data.get(self._key_in_parent)
+        if current is self._data:
+            return
+        if isinstance(current, dict):  # 同一路径已被其他写入创建,合并过去
+            current.update(self._data)
+            object.__setattr__(self, '_data', current)
+        else:
+            parent.data[self._key_in_parent] = self._data
+
+
+class _RWLock:
+    """读写锁:读操作可以并发,写操作独占;同一线程可重入,持有写锁时也可以再读"""
+
+    def __init__(self):
+        self._cond = Condition(Lock())
+        self._readers = {}  # 线程 id -> 持有读锁的层数
+        self._writer = None
+        self._write_depth = 0
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read_lock(self):
+        me = get_ident()
+        with self._cond:
+            if self._writer != me and me not in self._readers:
+                # 有写操作在等待时新的读操作让路,避免写操作饿死
+                while self._writer is not None or self._writers_waiting:
+                    self._cond.wait()
+            self._readers[me] = self._readers.get(me, 0) + 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                if self._readers[me] == 1:
+                    del self._readers[me]
+                    self._cond.notify_all()
+                else:
+                    self._readers[me] -= 1
+
+    @contextmanager
+    def write_lock(self):
+        me = get_ident()
+        with self._cond:
+            if self._writer != me:
+                if me in self._readers:
+                    raise RuntimeError("不能在持有读锁时申请写锁")
+                self._writers_waiting += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._cond.wait()
+                finally:
+                    self._writers_waiting -= 1
+                self._writer = me
+            self._write_depth += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._write_depth -= 1
+                if not self._write_depth:
+                    self._writer = None
+                    self._cond.notify_all()
+
+
 if __name__ == "__main__":
     pass
@@ -0,0 +1,211 @@
+import os
+import stat
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from diconfig import Config
+
+
+class ConfigTestCase(unittest.TestCase):
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name)
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+
+class WriteFileTest(ConfigTestCase):
+    @unittest.skipUnless(os.name == 'posix', "依赖 POSIX 权限位")
+    def test_keeps_file_mode(self):
+        cc = Config(file='secret', way='json')
+        os.chmod('secret.json', 0o600)
+        cc.write('k', 1)
+        self.assertEqual(stat.S_IMODE(os.stat('secret.json').st_mode), 0o600)
+
+    @unittest.skipUnless(hasattr(os, 'symlink') and os.name == 'posix', "需要符号链接")
+    def test_writes_through_symlink(self):
+        os.mkdir('real')
+        os.symlink(os.path.join('real', 'target.json'), 'link.json')
+        cc = Config(file='link', way='json', replace=True)
+        cc.write('a', 1)
+        self.assertTrue(os.path.islink('link.json'))
+        self.assertEqual(Config(file=os.path.join('real', 'target'), way='json').dict, {'a': 1})
+
+    def test_removes_temp_file_on_failure(self):
+        os.mkdir('dir.json')
+        cc = Config(file='c', way='json')
+        cc.save_to_file('dir.json')
+        self.assertEqual(sorted(os.listdir('.')), ['c.json', 'dir.json'])
+
+    @unittest.skipUnless(os.name == 'posix', "只有 POSIX 能 fsync 目录")
+    def test_durable_syncs_file_and_directory(self):
+        cc = Config(file='d', way='json', durable=True)
+        synced = []
+        real_fsync = os.fsync
+
+        def fsync(fd):
+            synced.append(stat.S_ISDIR(os.fstat(fd).st_mode))
+            real_fsync(fd)
+
+        with mock.patch('os.fsync', fsync):
+            cc.write('k', 1)
+        self.assertEqual(synced, [False, True])
+
+    def test_backup_keeps_previous_content(self):
+        cc = Config(file='b', way='json', backup=True)
+        cc.write('x', 1)
+        cc.write('x', 2)
+        self.assertEqual(Config(file='b.json.bak', way='json').dict, {'x': 1})
+        self.assertEqual(Config(file='b', way='json').dict, {'x': 2})
+
+
+class IncrementalSaveTest(ConfigTestCase):
+    def _reload(self, name, way):
+        return Config(file=name, way=way).dict
+
+    def test_shared_dict_ini(self):
+        cc = Config(file='s', way='ini')
+        shared = {'k': 'v'}
+        cc.write('s1', shared)
+        cc.write('s2', shared)
+        cc.s1.k = 'changed'
+        self.assertEqual(self._reload('s', 'ini'), cc.dict)
+
+    def test_shared_dict_xml(self):
+        cc = Config(file='s', way='xml')
+        shared = {'k': 'v'}
+        cc.write('s1', shared)
+        cc.write('s2', shared)
+        cc.s1.k = 'changed'
+        self.assertEqual(self._reload('s', 'xml'), cc.dict)
+
+    def test_shared_dict_update(self):
+        cc = Config(file='u', way='ini')
+        base = {'host': 'a'}
+        cc.update({'dev': base, 'prod': base})
+        cc.prod.host = 'b'
+        self.assertEqual(self._reload('u', 'ini'), cc.dict)
+
+    def test_equal_values_render_differently(self):
+        cc = Config(file='e', way='ini')
+        cc.write('sec.k', 1)
+        cc.write('sec.k', True)
+        with open('e.ini', encoding='utf-8') as f:
+            self.assertIn('True', f.read())
+
+
+class ToDictTest(ConfigTestCase):
+    def test_repr_follows_dict_mutation(self):
+        cc = Config(file='d', way='json')
+        cc.write('a', 1)
+        repr(cc.data)
+        cc.dict['b'] = 2
+        self.assertEqual(repr(cc.data), repr({'a': 1, 'b': 2}))
+
+    def test_caller_mutation_does_not_leak(self):
+        cc = Config(file='d', way='json')
+        cc.write('a.x', 1)
+        snapshot = cc.data.to_dict()
+        snapshot['a'] = 'other'
+        self.assertEqual(cc.data.to_dict(), {'a': {'x': 1}})
+
+
+class LazyNodeTest(ConfigTestCase):
+    def test_missing_read_does_not_mutate(self):
+        cc = Config(file='l', way='json')
+        node = cc.a.b.c
+        self.assertEqual(node.to_dict(), {})
+        self.assertEqual(cc.dict, {})
+        self.assertFalse(cc._dirty)
+
+    def test_nested_write_attaches(self):
+        cc = Config(file='l', way='json')
+        cc.a.b.c = 1
+        self.assertEqual(cc.dict, {'a': {'b': {'c': 1}}})
+        self.assertEqual(Config(file='l', way='json').dict, {'a': {'b': {'c': 1}}})
+
+    def test_item_write_attaches(self):
+        cc = Config(file='l', way='json')
+        cc.a['b'] = 1
+        self.assertEqual(cc.dict, {'a': {'b': 1}})
+
+    def test_lazy_nodes_on_same_path_merge(self):
+        cc = Config(file='l', way='json')
+        first, second = cc.a.b, cc.a.b
+        first.x = 1
+        second.y = 2
+        self.assertEqual(cc.dict, {'a': {'b': {'x': 1, 'y': 2}}})
+        first.z = 3
+        self.assertEqual(cc.dict, {'a': {'b': {'x': 1, 'y': 2, 'z': 3}}})
+
+    def test_attach_keeps_existing_siblings(self):
+        cc = Config(file='l', way='json')
+        cc.write('a.keep', 1)
+        cc.a.new.x = 2
+        self.assertEqual(cc.dict, {'a': {'keep': 1, 'new': {'x': 2}}})
+
+
+class DeferredSaveTest(ConfigTestCase):
+    def _on_disk(self, name):
+        return Config(file=name, way='json').dict
+
+    def test_pending_writes_flushed_at_exit(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        for options in ("batch_threshold=10", "batch_threshold=10, flush_interval=60"):
+            with self.subTest(options=options):
+                script = ("from diconfig import Config\n"
+                          f"cc = Config(file='exit', way='json', replace=True, {options})\n"
+                          "cc.write('k', 1)\n")
+                subprocess.run([sys.executable, '-c', script], check=True, cwd=os.getcwd(),
+                               env=dict(os.environ, PYTHONPATH=root))
+                self.assertEqual(self._on_disk('exit'), {'k': 1})
+
+    def test_flushed_config_not_kept_pending(self):
+        from diconfig.config import _pending_configs
+        cc = Config(file='p', way='json', batch_threshold=3)
+        cc.write('a', 1)
+        self.assertIn(cc, _pending_configs)
+        cc.flush()
+        self.assertNotIn(cc, _pending_configs)
+
+    def test_nested_batch_saves_once_at_outer_exit(self):
+        cc = Config(file='n', way='json')
+        with cc.batch():
+            with cc.batch():
+                cc.write('a', 1)
+            self.assertEqual(self._on_disk('n'), {})
+            self.assertFalse(cc.auto_save)
+            cc.write('b', 2)
+        self.assertTrue(cc.auto_save)
+        self.assertEqual(self._on_disk('n'), {'a': 1, 'b': 2})
+
+
+class TOMLSaveTest(ConfigTestCase):
+    DATA = {'a': None, 'b': {'c': None, 'd': 1}, 't': [{'x': None, 'y': 2}]}
+    EXPECTED = {'b': {'d': 1}, 't': [{'y': 2}]}
+
+    def test_none_values_dropped(self):
+        cc = Config(file='t', way='toml')
+        cc.update(self.DATA)
+        self.assertEqual(Config(file='t', way='toml').dict, self.EXPECTED)
+        self.assertEqual(cc.dict, self.DATA)  # 内存中的数据不受影响
+
+    def test_writers_agree(self):
+        import importlib.util
+        import toml
+        from diconfig.config import TOMLConfigHandler
+        if importlib.util.find_spec('tomli_w') is None:
+            self.skipTest("未安装 tomli_w")
+        import tomli_w
+        data = TOMLConfigHandler._drop_none(self.DATA)
+        self.assertEqual(toml.loads(tomli_w.dumps(data)), toml.loads(toml.dumps(self.DATA)))
+
+
+if __name__ == '__main__':
+    unittest.main()
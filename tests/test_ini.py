@@ -0,0 +1,130 @@
+import configparser
+import io
+import unittest
+
+from diconfig.config import INIConfigHandler
+
+LOAD_CASES = [
+    "[a]\nk = v\n",
+    "[a]\nk=v\nx : y\nz: 1 = 2\nw = 3 : 4\n",
+    "[a]\nKey = Value\n",
+    "# 注释\n; 注释\n[a]\n# k = 1\nk = v ; 不是行内注释\n",
+    "[a]\nk = first\n  second\n\tthird\n",
+    "[a]\nk = first\n\n  after blank\n",
+    "[a]\nk =\n[b]\n",
+    "[a]\nk = 100%\n",
+    "[a]\nk = %(x)s\nx = 1\n",
+    "[DEFAULT]\nd = 1\n[a]\nk = v\n",
+    "[a]\nk = 1\n[b]\nk = 2\n",
+    "[中文]\n键 = 值\n",
+    "\n\n[a]\n\n\nk = v\n\n",
+    "[a] \n  k = v\n",
+]
+
+ERROR_CASES = [
+    "k = v\n",
+    "[a]\nk = 1\nk = 2\n",
+    "[a]\nK = 1\nk = 2\n",
+    "[a]\n[a]\n",
+    "[a]\nnovalue\n",
+]
+
+SAVE_CASES = [
+    {'a': {'k': 'v'}},
+    {'a': {'K': 1, 'x': 2.5, 'y': True}},
+    {'a': {'k': 'first\nsecond'}},
+    {'a': {'k': '100%%'}},
+    {'a': {'k': ''}},
+    {'a': {}, 'b': {'k': 'v'}},
+    {'DEFAULT': {'d': 1}, 'a': {'k': 'v'}},
+    {'中文': {'键': '值'}},
+]
+
+
+def _configparser_load(text):
+    config = configparser.ConfigParser()
+    config.read_string(text)
+    return {s: dict(config.items(s)) for s in config.sections()}
+
+
+def _outcome(func, *args):
+    """返回结果,出错时返回异常类型,便于比较两边的行为"""
+    try:
+        return func(*args)
+    except Exception as e:
+        return type(e)
+
+
+def _configparser_save(data):
+    config = configparser.ConfigParser()
+    config.read_dict(data)
+    buf = io.StringIO()
+    config.write(buf)
+    return buf.getvalue()
+
+
+class INIParityTest(unittest.TestCase):
+    """自带的 ini 解析和写出应与 configparser 的结果一致"""
+
+    def setUp(self):
+        self.handler = INIConfigHandler()
+
+    def test_load_matches_configparser(self):
+        for text in LOAD_CASES:
+            with self.subTest(text=text):
+                self.assertEqual(_outcome(self.handler.load, io.StringIO(text)),
+                                 _outcome(_configparser_load, text))
+
+    def test_load_errors_match_configparser(self):
+        for text in ERROR_CASES:
+            with self.subTest(text=text):
+                with self.assertRaises(configparser.Error):
+                    _configparser_load(text)
+                with self.assertRaises(configparser.Error):
+                    self.handler.load(io.StringIO(text))
+
+    def test_save_matches_configparser(self):
+        for data in SAVE_CASES:
+            with self.subTest(data=data):
+                buf = io.StringIO()
+                self.handler.save(data, buf)
+                self.assertEqual(buf.getvalue(), _configparser_save(data))
+
+    def test_incremental_save_matches_configparser(self):
+        for data in SAVE_CASES:
+            with self.subTest(data=data):
+                cache = {}
+                for _ in range(2):
+                    buf = io.StringIO()
+                    self.handler.save(data, buf, cache)
+                    self.assertEqual(buf.getvalue(), _configparser_save(data))
+
+    def test_save_round_trip(self):
+        for data in SAVE_CASES:
+            with self.subTest(data=data):
+                buf = io.StringIO()
+                self.handler.save(data, buf)
+                text = buf.getvalue()
+                self.assertEqual(self.handler.load(io.StringIO(text)), _configparser_load(text))
+
+    def test_none_value_matches_configparser(self):
+        data = {'a': {'k': None}}
+        with self.assertRaises(TypeError):
+            _configparser_save(data)
+        with self.assertRaises(TypeError):
+            self.handler.save(data, io.StringIO())
+
+    def test_flat_data_wrapped_in_default_section(self):
+        buf = io.StringIO()
+        self.handler.save({'k': 'v', 'n': 1}, buf)
+        self.assertEqual(buf.getvalue(), _configparser_save({'默认': {'k': 'v', 'n': 1}}))
+
+    def test_strict_uses_configparser(self):
+        handler = INIConfigHandler()
+        handler.strict = True
+        text = "[a]\nk = %(x)s\nx = 1\n"
+        self.assertEqual(handler.load(io.StringIO(text)), _configparser_load(text))
+
+
+if __name__ == '__main__':
+    unittest.main()
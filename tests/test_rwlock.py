@@ -0,0 +1,116 @@
+import threading
+import unittest
+
+from diconfig.config import _RWLock
+
+TIMEOUT = 5
+
+
+class RWLockTest(unittest.TestCase):
+    def setUp(self):
+        self.lock = _RWLock()
+
+    def _start(self, target):
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        return thread
+
+    def test_readers_run_concurrently(self):
+        both_inside = threading.Barrier(2, timeout=TIMEOUT)
+        errors = []
+
+        def reader():
+            with self.lock.read_lock():
+                try:
+                    both_inside.wait()
+                except threading.BrokenBarrierError as e:
+                    errors.append(e)
+
+        threads = [self._start(reader) for _ in range(2)]
+        for thread in threads:
+            thread.join(TIMEOUT)
+        self.assertEqual(errors, [])
+
+    def test_writer_excludes_readers(self):
+        entered = threading.Event()
+
+        def reader():
+            with self.lock.read_lock():
+                entered.set()
+
+        with self.lock.write_lock():
+            thread = self._start(reader)
+            self.assertFalse(entered.wait(0.1))
+        self.assertTrue(entered.wait(TIMEOUT))
+        thread.join(TIMEOUT)
+
+    def test_writer_waits_for_readers(self):
+        entered = threading.Event()
+
+        def writer():
+            with self.lock.write_lock():
+                entered.set()
+
+        with self.lock.read_lock():
+            thread = self._start(writer)
+            self.assertFalse(entered.wait(0.1))
+        self.assertTrue(entered.wait(TIMEOUT))
+        thread.join(TIMEOUT)
+
+    def test_waiting_writer_blocks_new_readers(self):
+        writer_done = threading.Event()
+        reader_entered = threading.Event()
+        order = []
+
+        def writer():
+            with self.lock.write_lock():
+                order.append('writer')
+            writer_done.set()
+
+        def reader():
+            with self.lock.read_lock():
+                order.append('reader')
+                reader_entered.set()
+
+        with self.lock.read_lock():
+            writer_thread = self._start(writer)
+            # 等写线程进入等待状态
+            while not self.lock._writers_waiting:
+                writer_done.wait(0.01)
+            reader_thread = self._start(reader)
+            self.assertFalse(reader_entered.wait(0.1))
+        writer_thread.join(TIMEOUT)
+        reader_thread.join(TIMEOUT)
+        self.assertEqual(order, ['writer', 'reader'])
+
+    def test_reentrant(self):
+        with self.lock.read_lock():
+            with self.lock.read_lock():
+                pass
+        with self.lock.write_lock():
+            with self.lock.write_lock():
+                pass
+        self.assertEqual(self.lock._readers, {})
+        self.assertIsNone(self.lock._writer)
+
+    def test_read_inside_write(self):
+        with self.lock.write_lock():
+            with self.lock.read_lock():
+                pass
+            self.assertEqual(self.lock._writer, threading.get_ident())
+        self.assertEqual(self.lock._readers, {})
+        self.assertIsNone(self.lock._writer)
+
+    def test_upgrade_raises(self):
+        with self.lock.read_lock():
+            with self.assertRaises(RuntimeError):
+                with self.lock.write_lock():
+                    pass
+        # 失败的升级不应留下状态,之后仍能正常加写锁
+        with self.lock.write_lock():
+            pass
+        self.assertEqual(self.lock._writers_waiting, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()